@@ -3,11 +3,13 @@
 check_amd_gpu.py – Checks AMDGPU Kernel Driver, OpenCL, and Vulkan Support
 Copyright (c) 2025
 """
+import os
 import re
 import shutil
 import subprocess
 import sys
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 # --------------------------------------------------------------------------- #
 # ANSI Colors + Emojis
@@ -22,96 +24,198 @@ def fail(msg: str):  print(f"{RED}❌ {msg}{NC}")
 def info(msg: str):  print(f"{BLUE}[INFO]{NC}  {msg}")
 def warn(msg: str):  print(f"{YELL}[WARN]{NC}  {msg}")
 
+# --------------------------------------------------------------------------- #
+# Parsing patterns, compiled once at import
+_RE_DRIVER_IN_USE = re.compile(r"Kernel driver in use:\s*amdgpu", re.I)
+_RE_AMD_VENDOR    = re.compile(r"AMD|Advanced Micro Devices", re.I)
+_RE_VK_GPU_ID     = re.compile(r"GPU id .* AMD")
+_RE_VK_DRIVER     = re.compile(r"Driver Name\s*:\s*(.*)")
+_RE_VK_DEVICE     = re.compile(r"deviceName.*AMD", re.I)
+
 # --------------------------------------------------------------------------- #
 # Helper Routines
-def run(cmd: list[str]) -> str | None:
-    """Runs a command and returns stdout as a string, or None if an error occurs."""
+@lru_cache(maxsize=None)
+def run(cmd: tuple[str, ...]) -> str | None:
+    """Runs a command and returns stdout as a string, or None if an error occurs.
+
+    Memoized per argv tuple - repeated probes of the same tool cost one fork.
+    An absolute executable path plus close_fds=False keeps subprocess on
+    the vfork/posix_spawn fast path instead of a full fork.
+    """
+    exe = shutil.which(cmd[0])
+    if exe is None:
+        return None
     try:
-        return subprocess.check_output(cmd, stderr=subprocess.DEVNULL, text=True)
+        return subprocess.check_output((exe,) + cmd[1:], stderr=subprocess.DEVNULL,
+                                       text=True, close_fds=False)
     except (OSError, subprocess.CalledProcessError):
         return None
 
+def run_lines(cmd: tuple[str, ...]) -> subprocess.Popen | None:
+    """Starts a command for line-by-line stdout consumption (or None on error).
+
+    vulkaninfo dumps megabytes of text; streaming lets the caller stop
+    reading as soon as it has an answer instead of buffering everything.
+    """
+    exe = shutil.which(cmd[0])
+    if exe is None:
+        return None
+    try:
+        return subprocess.Popen((exe,) + cmd[1:], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, text=True,
+                                close_fds=False)
+    except OSError:
+        return None
+
+_BIN_DIRS = ("/usr/bin", "/usr/local/bin", "/opt/rocm/bin")
+
+@lru_cache(maxsize=None)
 def command_exists(cmd: str) -> bool:
+    # probe the usual install dirs directly; shutil.which walks the whole
+    # $PATH and stats every entry, which adds up on the failure paths
+    for d in _BIN_DIRS:
+        p = f"{d}/{cmd}"
+        if os.path.isfile(p) and os.access(p, os.X_OK):
+            return True
     return shutil.which(cmd) is not None
 
+@lru_cache(maxsize=None)
+def list_icds() -> tuple[str, ...]:
+    # scandir beats Path.glob here: no Path objects, no fnmatch
+    try:
+        with os.scandir("/etc/OpenCL/vendors") as it:
+            return tuple(e.name for e in it
+                         if e.name.endswith(".icd") and e.is_file())
+    except OSError:
+        return ()
+
+def _install_prefix() -> str:
+    if   command_exists("apt"):    return "sudo apt install"
+    elif command_exists("dnf"):    return "sudo dnf install"
+    elif command_exists("pacman"): return "sudo pacman -S"
+    return "<use your package manager>:"
+
+# resolved once at import; every failure branch reuses it
+_INSTALL_PREFIX = _install_prefix()
+
 def suggest(pkg: str) -> str:
-    if   command_exists("apt"):    return f"sudo apt install {pkg}"
-    elif command_exists("dnf"):    return f"sudo dnf install {pkg}"
-    elif command_exists("pacman"): return f"sudo pacman -S {pkg}"
-    return f"<use your package manager>: {pkg}"
+    return f"{_INSTALL_PREFIX} {pkg}"
 
 # --------------------------------------------------------------------------- #
 # 1)  AMDGPU Driver
-def check_amdgpu() -> bool:
-    info("Checking AMDGPU kernel driver …")
-    lspci = run(["lspci", "-k"])
-    if lspci is None:
-        fail("lspci not available.")
+def amdgpu_card_count() -> int | None:
+    """Counts DRM cards bound to amdgpu via sysfs; None if sysfs shows no cards."""
+    try:
+        with os.scandir("/sys/class/drm") as it:
+            cards = [e.name for e in it
+                     if e.name.startswith("card") and e.name[4:].isdigit()]
+    except OSError:
+        return None
+    if not cards:
+        return None
+    count = 0
+    for card in cards:
+        try:
+            drv = os.readlink(f"/sys/class/drm/{card}/device/driver")
+        except OSError:
+            continue
+        if os.path.basename(drv) == "amdgpu":
+            count += 1
+    return count
+
+def amdgpu_module_loaded() -> bool:
+    # /proc/modules is what lsmod parses anyway - skip the fork
+    try:
+        with open("/proc/modules", "rb") as fh:
+            return any(line.startswith(b"amdgpu ") for line in fh)
+    except OSError:
         return False
 
-    gpu_cnt = len(re.findall(r"Kernel driver in use:\s*amdgpu", lspci, re.I))
+def check_amdgpu(lspci: str | None = None) -> bool:
+    info("Checking AMDGPU kernel driver …")
+    gpu_cnt = amdgpu_card_count()
+    if gpu_cnt is None:
+        # no DRM cards visible - fall back to lspci
+        if lspci is None:
+            lspci = run(("lspci", "-k"))
+        if lspci is None:
+            fail("lspci not available.")
+            return False
+        gpu_cnt = len(_RE_DRIVER_IN_USE.findall(lspci))
+
     if gpu_cnt:
         ok(f"AMDGPU driver used by {gpu_cnt} GPU(s).")
     else:
         fail("No GPU is using AMDGPU (maybe using radeon/proprietary?).")
         return False
 
-    if run(["lsmod"]) and re.search(r"^\s*amdgpu", run(["lsmod"]) or "", re.M):
+    if amdgpu_module_loaded():
         info("amdgpu module is loaded.")
     else:
-        info("amdgpu not found in lsmod ⇒ probably built-in to kernel (OK).")
+        info("amdgpu not found in /proc/modules ⇒ probably built-in to kernel (OK).")
     return True
 
 # --------------------------------------------------------------------------- #
 # 2)  OpenCL Runtime (clinfo)
-def count_amd_gpus_clinfo(clinfo_out: str) -> int:
+def parse_clinfo(clinfo_out: str) -> tuple[list[str], int]:
     """
-    Counts device blocks in clinfo output where
+    Single pass over clinfo output; returns the platform names and the
+    number of device blocks where
       • Device Vendor = AMD/Advanced Micro Devices  and
       • Device Type   = GPU
     occur.
     """
+    platforms = []
     count = 0
     v = g = False
     for raw in clinfo_out.splitlines():
+        # cheap containment gate: skip the lstrip allocation for the vast
+        # majority of lines that cannot match any prefix below
+        if "Platform Name" not in raw and "Device" not in raw \
+           and "Max compute units" not in raw:
+            continue
         line = raw.lstrip()
-        if line.startswith("Device Name"):
+        if line.startswith("Platform Name"):
+            name = line.partition(":")[2].strip()
+            if name:
+                platforms.append(name)
+        elif line.startswith("Device Name"):
             v = g = False
         elif line.startswith("Device Vendor") and \
-             re.search(r"AMD|Advanced Micro Devices", line, re.I):
+             _RE_AMD_VENDOR.search(line):
             v = True
         elif line.startswith("Device Type") and "GPU" in line:
             g = True
         elif line.startswith("Max compute units") and v and g:
             count += 1
             v = g = False
-    return count
+    return platforms, count
 
-def check_opencl() -> bool:
+def check_opencl(clinfo_out: str | None = None) -> bool:
     info("Checking OpenCL runtime …")
     if not command_exists("clinfo"):
         fail("clinfo is missing.")
         print(f"→ {suggest('clinfo mesa-opencl-icd')}")
         return False
 
-    icd_files = list(Path("/etc/OpenCL/vendors").glob("*.icd"))
+    icd_files = list_icds()
     if icd_files:
-        info(f"Found OpenCL ICDs: {', '.join(f.name for f in icd_files)}")
+        info(f"Found OpenCL ICDs: {', '.join(icd_files)}")
     else:
         warn("No OpenCL ICD files found!")
 
-    clinfo_out = run(["clinfo"])
+    if clinfo_out is None:
+        clinfo_out = run(("clinfo",))
     if clinfo_out is None:
         fail("Failed to execute clinfo.")
         return False
 
-    platforms = re.findall(r"Platform Name\s+:\s+(.*)", clinfo_out)
+    platforms, gpus = parse_clinfo(clinfo_out)
     info(f"Found OpenCL platform(s): {', '.join(platforms) or 'none'}")
 
-    gpus = count_amd_gpus_clinfo(clinfo_out)
     if gpus > 0:
         ok(f"AMD GPU(s) detected as OpenCL device(s) – Count: {gpus}")
-        used_impls = [f.name.lower() for f in icd_files]
+        used_impls = [f.lower() for f in icd_files]
         if any("rusticl" in impl for impl in used_impls):
             warn("Rusticl OpenCL detected – limited functionality (software stack without full GPGPU acceleration).")
             print("→ For full features (e.g., GPGPU, ML, PyOpenCL) use ROCm or AMDGPU-Pro.")
@@ -130,22 +234,32 @@ def check_opencl() -> bool:
 
 # --------------------------------------------------------------------------- #
 # 3)  Vulkan Stack
-def check_vulkan() -> bool:
+def check_vulkan(summary: str | None = None) -> bool:
     info("Checking Vulkan stack …")
     if not command_exists("vulkaninfo"):
         fail("vulkaninfo is missing.")
         print(f"→ {suggest('vulkan-tools mesa-vulkan-drivers')}")
         return False
 
-    summary = run(["vulkaninfo", "--summary"])
-    if summary and re.search(r"GPU id .* AMD", summary):
-        driver = re.search(r"Driver Name\s*:\s*(.*)", summary)
+    if summary is None:
+        summary = run(("vulkaninfo", "--summary"))
+    if summary and _RE_VK_GPU_ID.search(summary):
+        driver = _RE_VK_DRIVER.search(summary)
         ok(f"AMD GPU detected via Vulkan  [Driver: {driver.group(1).strip() if driver else 'unknown'}]")
         return True
 
-    # Fallback: full scan
-    full_output = run(["vulkaninfo"])
-    if full_output and re.search(r"deviceName.*AMD", full_output, re.I):
+    # Fallback: full scan, streamed so we can stop at the first hit
+    found = False
+    proc = run_lines(("vulkaninfo",))
+    if proc is not None:
+        with proc.stdout as lines:
+            for line in lines:
+                if _RE_VK_DEVICE.search(line):
+                    found = True
+                    break
+        proc.terminate()
+        proc.wait()
+    if found:
         ok("AMD GPU detected via Vulkan (Fallback through full scan).")
         return True
 
@@ -155,11 +269,17 @@ def check_vulkan() -> bool:
 
 # --------------------------------------------------------------------------- #
 def main() -> None:
-    success = all((
-        check_amdgpu(),
-        check_opencl(),
-        check_vulkan(),
-    ))
+    # the probe tools are independent and each cost real wall time to
+    # start; launch them together and consume the results in report order
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        f_lspci = ex.submit(run, ("lspci", "-k"))
+        f_clinfo = ex.submit(run, ("clinfo",)) if command_exists("clinfo") else None
+        f_vulkan = ex.submit(run, ("vulkaninfo", "--summary")) if command_exists("vulkaninfo") else None
+        success = all((
+            check_amdgpu(f_lspci.result()),
+            check_opencl(f_clinfo.result() if f_clinfo else None),
+            check_vulkan(f_vulkan.result() if f_vulkan else None),
+        ))
     print()
     if success:
         ok("All checks passed – system ready. 🎉")
@@ -3,9 +3,14 @@
 check_amd_gpu.py – Checks AMDGPU Kernel Driver, OpenCL, Vulkan, and ROCm Support
 Copyright (c) 2025
 """
+import argparse
+import os
 import shutil
 import subprocess
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
 # --------------------------------------------------------------------------- #
@@ -16,47 +21,116 @@ BLUE  = "\033[1;34m"
 YELL  = "\033[1;33m"
 NC    = "\033[0m"
 
-def ok(msg: str):    print(f"{GREEN}✅ {msg}{NC}")
-def fail(msg: str):  print(f"{RED}❌ {msg}{NC}")
-def info(msg: str):  print(f"{BLUE}[INFO]{NC}  {msg}")
-def warn(msg: str):  print(f"{YELL}[WARN]{NC}  {msg}")
+# escape codes are noise in piped output; honor NO_COLOR as well
+if "NO_COLOR" in os.environ or not sys.stdout.isatty():
+    GREEN = RED = BLUE = YELL = NC = ""
+
+# prefixes built once instead of a three-way f-string per log line
+PREFIX_OK   = f"{GREEN}✅"
+PREFIX_FAIL = f"{RED}❌"
+PREFIX_INFO = f"{BLUE}[INFO]{NC} "
+PREFIX_WARN = f"{YELL}[WARN]{NC} "
+
+def ok(msg: str):    print(PREFIX_OK, f"{msg}{NC}")
+def fail(msg: str):  print(PREFIX_FAIL, f"{msg}{NC}")
+def info(msg: str):  print(PREFIX_INFO, msg)
+def warn(msg: str):  print(PREFIX_WARN, msg)
 
 # --------------------------------------------------------------------------- #
-def run(cmd: list[str]) -> str | None:
+# wall-clock bounds per tool: clinfo is known to hang forever on broken
+# ICD loaders, vulkaninfo enumerates layers slowly, the rest are instant
+_TIMEOUTS = {"clinfo": 15, "vulkaninfo": 10}
+
+@lru_cache(maxsize=None)
+def run(cmd: tuple[str, ...]) -> str | None:
+    # memoized per argv tuple: repeated probes of the same tool cost one
+    # spawn. Resolving the executable and leaving close_fds off lets
+    # CPython take the cheaper posix_spawn path (no fds worth hiding here).
+    exe = shutil.which(cmd[0])
+    if exe is None:
+        return None
     try:
-        return subprocess.check_output(cmd, stderr=subprocess.DEVNULL, text=True)
-    except (OSError, subprocess.CalledProcessError):
+        raw = subprocess.check_output((exe,) + cmd[1:], stderr=subprocess.DEVNULL,
+                                      close_fds=False,
+                                      timeout=_TIMEOUTS.get(cmd[0], 3))
+    except (OSError, subprocess.CalledProcessError, subprocess.TimeoutExpired):
+        return None
+    # capture as bytes and decode once; text=True would route the output
+    # through a TextIOWrapper and the locale codec
+    return raw.decode("utf-8", "replace")
+
+def run_lines(cmd: tuple[str, ...]) -> subprocess.Popen | None:
+    # Popen in binary mode: blobs we only substring-scan (full vulkaninfo
+    # is hundreds of KB) are consumed line-by-line straight from the pipe
+    # instead of being decoded and materialized
+    exe = shutil.which(cmd[0])
+    if exe is None:
+        return None
+    try:
+        return subprocess.Popen((exe,) + cmd[1:], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, close_fds=False)
+    except OSError:
         return None
 
 def command_exists(cmd: str) -> bool:
     return shutil.which(cmd) is not None
 
+# detected once: every failure path calls suggest(), and each
+# shutil.which probe stats the whole $PATH again
+_PKG_MGR = next((mgr for mgr in ("apt", "dnf", "pacman") if shutil.which(mgr)), None)
+_PKG_FORMATS = {
+    "apt":    "sudo apt install {pkg}",
+    "dnf":    "sudo dnf install {pkg}",
+    "pacman": "sudo pacman -S {pkg}",
+    None:     "<use your package manager>: {pkg}",
+}
+
 def suggest(pkg: str) -> str:
-    if   command_exists("apt"):    return f"sudo apt install {pkg}"
-    elif command_exists("dnf"):    return f"sudo dnf install {pkg}"
-    elif command_exists("pacman"): return f"sudo pacman -S {pkg}"
-    return f"<use your package manager>: {pkg}"
+    return _PKG_FORMATS[_PKG_MGR].format(pkg=pkg)
 
 # --------------------------------------------------------------------------- #
-def detect_gpu_model() -> None:
+def detect_gpu_model(lspci: str | None = None) -> bool:
+    """Report detected AMD/ATI GPUs. False means lspci worked and saw none."""
     info("Detecting GPU model …")
-    lspci = run(["lspci", "-nn"])
+    if lspci is None:
+        lspci = run(("lspci", "-nnk"))
     if not lspci:
         warn("Could not detect GPU model (lspci failed).")
-        return
+        return True  # unknown - let the runtime checks speak for themselves
 
-    gpu_lines = [line for line in lspci.splitlines() if "VGA" in line and ("AMD" in line or "ATI" in line)]
+    # hybrid dGPUs and headless compute cards enumerate as "Display
+    # controller" or "3D controller", not "VGA"
+    gpu_lines = [line for line in lspci.splitlines()
+                 if ("AMD" in line or "ATI" in line)
+                 and ("VGA" in line or "Display controller" in line
+                      or "3D controller" in line)]
     if gpu_lines:
         for line in gpu_lines:
             ok(f"GPU Detected: {line.strip()}")
-    else:
-        warn("No AMD/ATI GPU found in lspci output.")
+        return True
+    # last word goes to the kernel: a DRM card bound to amdgpu is an AMD
+    # GPU no matter how lspci classified it
+    if amdgpu_card_count():
+        ok("AMD GPU detected via sysfs (DRM card bound to amdgpu).")
+        return True
+    warn("No AMD/ATI GPU found in lspci output.")
+    return False
 
 # --------------------------------------------------------------------------- #
+@lru_cache(maxsize=None)
+def list_icds() -> tuple[str, ...]:
+    # one scandir instead of a Path.glob that wraps and stats every entry;
+    # cached so check_opencl and check_rocm share the same single scan
+    try:
+        with os.scandir("/etc/OpenCL/vendors") as it:
+            return tuple(e.name for e in it if e.name.endswith(".icd"))
+    except OSError:
+        return ()
+
 def check_rocm() -> bool:
     info("Checking for ROCm support …")
-    icds = list(Path("/etc/OpenCL/vendors").glob("*.icd"))
-    rocm_icds = [f for f in icds if "rocm" in f.name.lower() or "amd" in f.name.lower()]
+    icds = list_icds()
+    rocm_icds = [name for name in icds if "rocm" in name.lower() or "amd" in name.lower()]
     tools = [cmd for cmd in ("rocminfo", "hipinfo") if command_exists(cmd)]
 
     if rocm_icds or tools:
@@ -68,34 +142,114 @@ def check_rocm() -> bool:
     return False
 
 # --------------------------------------------------------------------------- #
-def check_amdgpu() -> bool:
-    info("Checking AMDGPU kernel driver …")
-    lspci = run(["lspci", "-k"])
-    if lspci is None:
-        fail("lspci not available.")
+def amdgpu_card_count() -> int | None:
+    # the bound driver is a sysfs symlink; a couple of readlinks answer
+    # what lspci -k needs a full PCI-database walk for. None means no DRM
+    # sysfs at all (stripped container), not "no AMD GPU".
+    seen = False
+    count = 0
+    for card in Path("/sys/class/drm").glob("card[0-9]*"):
+        if not card.name[4:].isdigit():  # skip card0-DP-1 connector nodes
+            continue
+        seen = True
+        try:
+            driver = os.readlink(card / "device" / "driver")
+        except OSError:
+            continue
+        if driver.rsplit("/", 1)[-1] == "amdgpu":
+            count += 1
+    return count if seen else None
+
+def _sysread(path: Path) -> str:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return ""
+
+def sysfs_probe() -> bool:
+    """--fast mode: report what sysfs alone knows, without spawning a tool.
+
+    Covers vendor/device IDs, bound driver, VRAM and PCIe link state -
+    enough for monitoring loops that cannot afford the clinfo/vulkaninfo
+    startup cost.
+    """
+    info("Fast sysfs-only probe (no tool invocation) …")
+    found = False
+    for card in sorted(Path("/sys/class/drm").glob("card[0-9]*")):
+        if not card.name[4:].isdigit():
+            continue
+        dev = card / "device"
+        vendor = _sysread(dev / "vendor")
+        if not vendor:
+            continue
+        try:
+            driver = os.readlink(dev / "driver").rsplit("/", 1)[-1]
+        except OSError:
+            driver = "none"
+        if vendor != "0x1002":
+            info(f"{card.name}: vendor {vendor} (not AMD), driver: {driver}")
+            continue
+        found = True
+        device_id = _sysread(dev / "device")
+        vram = _sysread(dev / "mem_info_vram_total")
+        vram_s = f"{int(vram) // 1024 ** 2} MiB" if vram.isdigit() else "n/a"
+        link = f"{_sysread(dev / 'current_link_speed')} x{_sysread(dev / 'current_link_width')}".strip()
+        ok(f"{card.name}: AMD GPU [device {device_id}], driver: {driver}, "
+           f"VRAM: {vram_s}, PCIe: {link or 'n/a'}")
+    if not found:
+        fail("No AMD GPU found in /sys/class/drm.")
+    return found
+
+def amdgpu_module_loaded() -> bool:
+    # lsmod only reformats /proc/modules; read the source, zero forks
+    try:
+        with open("/proc/modules", "rb") as f:
+            return any(line.startswith(b"amdgpu ") for line in f)
+    except OSError:
         return False
 
-    gpu_cnt = sum("Kernel driver in use: amdgpu" in line for line in lspci.splitlines())
+def check_amdgpu(lspci: str | None = None) -> bool:
+    info("Checking AMDGPU kernel driver …")
+    gpu_cnt = amdgpu_card_count()
+    if gpu_cnt is None:
+        if lspci is None:
+            lspci = run(("lspci", "-nnk"))
+        if lspci is None:
+            fail("lspci not available.")
+            return False
+        gpu_cnt = sum("Kernel driver in use: amdgpu" in line for line in lspci.splitlines())
     if gpu_cnt:
         ok(f"AMDGPU driver used by {gpu_cnt} GPU(s).")
     else:
         fail("No GPU is using AMDGPU (maybe using radeon/proprietary?).")
         return False
 
-    lsmod_out = run(["lsmod"]) or ""
-    if any(line.startswith("amdgpu") for line in lsmod_out.splitlines()):
+    if amdgpu_module_loaded():
         info("amdgpu module is loaded.")
     else:
-        info("amdgpu not found in lsmod ⇒ probably built-in to kernel (OK).")
+        info("amdgpu not in /proc/modules ⇒ probably built-in to kernel (OK).")
     return True
 
 # --------------------------------------------------------------------------- #
-def count_amd_gpus_clinfo(clinfo_out: str) -> int:
+def parse_clinfo(clinfo_out: str) -> tuple[set[str], int]:
+    # one pass over the dump: platform names and the AMD-GPU count fall
+    # out of the same loop instead of two full scans
+    platforms: set[str] = set()
     count = 0
     v = g = False
     for raw in clinfo_out.splitlines():
+        # C-level containment gates first: most lines carry none of the
+        # labels we care about, so they skip the lstrip copy entirely
+        if ("Device" not in raw and "Platform Name" not in raw
+                and "Max compute units" not in raw):
+            continue
         line = raw.lstrip()
-        if line.startswith("Device Name"):
+        if line.startswith("Platform Name"):
+            _, sep, val = line.partition(":")
+            name = val.strip() if sep else line.replace("Platform Name", "").strip()
+            if name:
+                platforms.add(name)
+        elif line.startswith("Device Name"):
             v = g = False
         elif line.startswith("Device Vendor") and ("AMD" in line or "Advanced Micro Devices" in line):
             v = True
@@ -104,39 +258,33 @@ def count_amd_gpus_clinfo(clinfo_out: str) -> int:
         elif line.startswith("Max compute units") and v and g:
             count += 1
             v = g = False
-    return count
+    return platforms, count
 
-def check_opencl() -> bool:
+def check_opencl(clinfo_out: str | None = None) -> bool:
     info("Checking OpenCL runtime …")
     if not command_exists("clinfo"):
         fail("clinfo is missing.")
         print(f"→ {suggest('clinfo mesa-opencl-icd')}")
         return False
 
-    icd_files = list(Path("/etc/OpenCL/vendors").glob("*.icd"))
+    icd_files = list_icds()
     if icd_files:
-        info(f"Found OpenCL ICDs: {', '.join(f.name for f in icd_files)}")
+        info(f"Found OpenCL ICDs: {', '.join(icd_files)}")
     else:
         warn("No OpenCL ICD files found!")
 
-    clinfo_out = run(["clinfo"])
+    if clinfo_out is None:
+        clinfo_out = run(("clinfo",))
     if clinfo_out is None:
         fail("Failed to execute clinfo.")
         return False
 
-    platforms = set()
-    for line in clinfo_out.splitlines():
-        if "Platform Name" in line:
-            parts = line.strip().split(":", 1)
-            name = parts[1].strip() if len(parts) > 1 else parts[0].replace("Platform Name", "").strip()
-            if name:
-                platforms.add(name)
+    platforms, gpus = parse_clinfo(clinfo_out)
     info(f"Found OpenCL platform(s): {', '.join(sorted(platforms)) or 'none'}")
 
-    gpus = count_amd_gpus_clinfo(clinfo_out)
     if gpus > 0:
         ok(f"AMD GPU(s) detected as OpenCL device(s) – Count: {gpus}")
-        used_impls = [f.name.lower() for f in icd_files]
+        used_impls = [name.lower() for name in icd_files]
         if any("rusticl" in impl for impl in used_impls):
             warn("Rusticl OpenCL detected – limited functionality.")
             print("→ For full features (e.g., GPGPU, ML, PyOpenCL) use ROCm or AMDGPU-Pro.")
@@ -154,23 +302,58 @@ def check_opencl() -> bool:
     return False
 
 # --------------------------------------------------------------------------- #
-def check_vulkan() -> bool:
+def scan_vulkan_lines(lines) -> bool:
+    for line in lines:
+        s = line.lstrip()
+        # one-byte pre-filter: almost every line of the dump fails this
+        # before any deeper comparison runs
+        if s[:1] != b"d" or not s.startswith(b"deviceName"):
+            continue
+        if b"AMD" in s:
+            return True
+    return False
+
+def check_vulkan(summary: str | None = None) -> bool:
     info("Checking Vulkan stack …")
     if not command_exists("vulkaninfo"):
         fail("vulkaninfo is missing.")
         print(f"→ {suggest('vulkan-tools mesa-vulkan-drivers')}")
         return False
 
-    summary = run(["vulkaninfo", "--summary"])
+    if summary is None:
+        summary = run(("vulkaninfo", "--summary"))
     if summary and "AMD" in summary:
-        driver = next((line.split(":", 1)[1].strip()
-                       for line in summary.splitlines()
-                       if "Driver Name" in line), "unknown")
+        driver = "unknown"
+        for line in summary.splitlines():
+            if "Driver Name" in line:
+                driver = line.partition(":")[2].strip()
+                break
         ok(f"AMD GPU detected via Vulkan  [Driver: {driver}]")
         return True
 
-    full_output = run(["vulkaninfo"])
-    if full_output and any("deviceName" in line and "AMD" in line for line in full_output.splitlines()):
+    proc = run_lines(("vulkaninfo",))
+    found = False
+    if proc is not None:
+        # watchdog for the read loop itself: a tool that wedges mid-stream
+        # with the pipe still open would block the iteration forever; the
+        # kill closes the pipe and the loop falls out with found=False
+        watchdog = threading.Timer(_TIMEOUTS["vulkaninfo"], proc.kill)
+        watchdog.start()
+        try:
+            with proc.stdout as lines:
+                found = scan_vulkan_lines(lines)
+        finally:
+            watchdog.cancel()
+        # a hit stops the scan mid-stream; make sure the child is reaped
+        # and never wait on it longer than the tool's own budget
+        if proc.poll() is None:
+            proc.terminate()
+        try:
+            proc.wait(timeout=_TIMEOUTS["vulkaninfo"])
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+    if found:
         ok("AMD GPU detected via Vulkan (Fallback through full scan).")
         return True
 
@@ -180,13 +363,33 @@ def check_vulkan() -> bool:
 
 # --------------------------------------------------------------------------- #
 def main() -> None:
-    detect_gpu_model()
-    print()
-    success = all((
-        check_amdgpu(),
-        check_opencl(),
-        check_vulkan(),
-    ))
+    parser = argparse.ArgumentParser(description="Check AMDGPU / OpenCL / Vulkan / ROCm support")
+    parser.add_argument("-f", "--fast", action="store_true",
+                        help="sysfs-only probe, skips clinfo/vulkaninfo (for scripting)")
+    args = parser.parse_args()
+    if args.fast:
+        sys.exit(0 if sysfs_probe() else 1)
+
+    # clinfo/vulkaninfo are independent and each cost real wall time to
+    # start; launch them together and keep the report order by consuming
+    # the results in sequence. The cheap lspci gate runs first so the
+    # heavy probes are never spawned on machines without an AMD GPU.
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        # -nnk carries both the device/vendor IDs and the bound kernel
+        # driver, so one invocation feeds detect_gpu_model and check_amdgpu
+        f_lspci = ex.submit(run, ("lspci", "-nnk"))
+        if not detect_gpu_model(f_lspci.result()):
+            print()
+            fail("No AMD GPU present – skipping OpenCL/Vulkan checks.")
+            sys.exit(1)
+        f_clinfo = ex.submit(run, ("clinfo",)) if command_exists("clinfo") else None
+        f_vulkan = ex.submit(run, ("vulkaninfo", "--summary")) if command_exists("vulkaninfo") else None
+        print()
+        success = all((
+            check_amdgpu(f_lspci.result()),
+            check_opencl(f_clinfo.result() if f_clinfo else None),
+            check_vulkan(f_vulkan.result() if f_vulkan else None),
+        ))
     print()
     check_rocm()
     print()
@@ -198,10 +401,11 @@ def main() -> None:
 
     print()
     info("For detailed inspection, use:")
-    print("   lspci | grep -i vga")
-    print("   clinfo")
-    print("   vulkaninfo")
-    print("   rocminfo")
+    # one write instead of a lock-and-flush per hint line
+    sys.stdout.write("   lspci | grep -i vga\n"
+                     "   clinfo\n"
+                     "   vulkaninfo\n"
+                     "   rocminfo\n")
 
     sys.exit(0 if success else 1)
 
@@ -7,6 +7,8 @@ import subprocess
 import shutil
 import sys
 import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
 GREEN = "\033[1;32m"
@@ -15,10 +17,17 @@ BLUE  = "\033[1;34m"
 YELL  = "\033[1;33m"
 NC    = "\033[0m"
 
-def ok(msg): print(f"{GREEN}✅ {msg}{NC}")
-def fail(msg): print(f"{RED}❌ {msg}{NC}")
-def info(msg): print(f"{BLUE}[INFO]{NC}  {msg}")
-def warn(msg): print(f"{YELL}[WARN]{NC}  {msg}")
+# templates interpolated once at import; each call is one %-format
+# and one write instead of four concatenations through print()
+_FMT_OK   = f"{GREEN}✅ %s{NC}\n"
+_FMT_FAIL = f"{RED}❌ %s{NC}\n"
+_FMT_INFO = f"{BLUE}[INFO]{NC}  %s\n"
+_FMT_WARN = f"{YELL}[WARN]{NC}  %s\n"
+
+def ok(msg): sys.stdout.write(_FMT_OK % msg)
+def fail(msg): sys.stdout.write(_FMT_FAIL % msg)
+def info(msg): sys.stdout.write(_FMT_INFO % msg)
+def warn(msg): sys.stdout.write(_FMT_WARN % msg)
 
 def run(cmd):
     try:
@@ -26,6 +35,15 @@ def run(cmd):
     except Exception:
         return None
 
+def run_stream(cmd):
+    # Popen so the tool starts right away and its stdout can be parsed
+    # line-by-line without materializing the whole dump in memory.
+    try:
+        return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    except Exception:
+        return None
+
+@lru_cache(maxsize=None)
 def command_exists(cmd):
     return shutil.which(cmd) is not None
 
@@ -35,89 +53,113 @@ def suggest(pkg):
     if command_exists("pacman"): return f"sudo pacman -S {pkg}"
     return f"<use your package manager>: {pkg}"
 
-def check_amdgpu():
+def check_amdgpu(lspci=None, lsmod=None):
+    """True/False per lspci; None when lspci is unavailable (unknown)."""
     info("Checking AMDGPU kernel driver …")
-    lspci = run(["lspci", "-k"])
+    if lspci is None:
+        lspci = run(["lspci", "-k"])
     if not lspci:
         fail("Cannot detect GPUs (lspci failed).")
-        return False
+        return None
 
-    count = sum("Kernel driver in use: amdgpu" in line for line in lspci.splitlines())
+    # one C-level substring scan; the marker cannot span lines
+    count = lspci.count("Kernel driver in use: amdgpu")
     if count:
         ok(f"AMDGPU driver used by {count} GPU(s).")
     else:
         fail("No GPU is using AMDGPU.")
         return False
 
-    lsmod = run(["lsmod"]) or ""
-    if "amdgpu" in lsmod:
+    if lsmod is None:
+        lsmod = run(["lsmod"])
+    if "amdgpu" in (lsmod or ""):
         info("amdgpu module is loaded.")
     else:
         info("amdgpu not listed – may be built-in to kernel.")
     return True
 
-def parse_opencl_devices(text):
+_RE_AMD_VENDOR = re.compile(r"amd|advanced micro devices", re.I)
+
+# the only clinfo keys the vendor filter and summarize_opencl read;
+# everything else (hundreds of extension/limit lines) is dropped unparsed
+_CL_WANTED = frozenset((
+    "Device Name", "Device Vendor", "Device Type",
+    "Max compute units", "Max clock frequency",
+    "Global memory size", "Max memory allocation", "Local memory size",
+    "Max constant buffer size", "Max work group size",
+    "Preferred work group size multiple (device)", "Max work item sizes",
+    "Device OpenCL C Version", "IL version",
+))
+
+def parse_opencl_devices(lines):
     platforms = set()
     devices = []
     current_device = {}
-    for line in text.splitlines():
+    for line in lines:
         line = line.strip()
-        if "Platform Name" in line:
-            parts = line.split(":", 1) if ":" in line else line.split(None, 2)
-            if len(parts) > 1:
-                platforms.add(parts[-1].strip())
-        if "Device Name" in line:
-            if current_device:
-                devices.append(current_device)
-                current_device = {}
-        if ":" in line:
-            key, val = map(str.strip, line.split(":", 1))
-        elif re.search(r" {2,}", line):
-            parts = re.split(r" {2,}", line)
-            if len(parts) >= 2:
-                key, val = parts[0], parts[1]
-            else:
-                continue
+        # column form first: ROCm device names like gfx906:sramecc+:xnack-
+        # contain ':', so partitioning before the two-space split would cut
+        # the key inside the value and merge consecutive devices
+        i = line.find("  ")
+        if i >= 0:
+            key, val = line[:i].rstrip(":"), line[i:].lstrip()
         else:
-            continue
-        current_device[key] = val
+            key, sep, val = line.partition(":")
+            if not sep:
+                continue
+            key, val = key.strip(), val.strip()
+        if key == "Platform Name" and val:
+            platforms.add(val)
+        if key == "Device Name" and current_device:
+            devices.append(current_device)
+            current_device = {}
+        if key in _CL_WANTED:
+            current_device[key] = val
     if current_device:
         devices.append(current_device)
     amd_devices = [d for d in devices if
                    "Device Vendor" in d and "Device Type" in d and
                    "gpu" in d["Device Type"].lower() and
-                   re.search(r"amd|advanced micro devices", d["Device Vendor"], re.I)]
+                   _RE_AMD_VENDOR.search(d["Device Vendor"])]
     return platforms, amd_devices
 
 def summarize_opencl(d):
-    print("\n📌 OpenCL Device Summary:")
-    print(f"  Device Name                 : {d.get('Device Name')}")
-    print(f"  Device Type                 : {d.get('Device Type')}")
-    print(f"  Max Compute Units           : {d.get('Max compute units')}")
-    print(f"  Max Clock Frequency         : {d.get('Max clock frequency')}")
-    print(f"  Global Memory Size          : {d.get('Global memory size')} bytes")
-    print(f"  Max Memory Allocation       : {d.get('Max memory allocation')} bytes")
-    print(f"  Local Memory Size           : {d.get('Local memory size')} bytes")
-    print(f"  Max Constant Buffer Size    : {d.get('Max constant buffer size')} bytes")
-    print(f"  Max Work Group Size         : {d.get('Max work group size')}")
-    print(f"  Preferred WG Size Multiple  : {d.get('Preferred work group size multiple (device)')}")
-    print(f"  Max Work Item Sizes         : {d.get('Max work item sizes')}")
-    print(f"  OpenCL C Version            : {d.get('Device OpenCL C Version')}")
-    print(f"  IL Version                  : {d.get('IL version')}")
-
-def check_opencl():
+    # one write for the whole block instead of 14 locked print calls
+    sys.stdout.write("\n".join((
+        "\n📌 OpenCL Device Summary:",
+        f"  Device Name                 : {d.get('Device Name')}",
+        f"  Device Type                 : {d.get('Device Type')}",
+        f"  Max Compute Units           : {d.get('Max compute units')}",
+        f"  Max Clock Frequency         : {d.get('Max clock frequency')}",
+        f"  Global Memory Size          : {d.get('Global memory size')} bytes",
+        f"  Max Memory Allocation       : {d.get('Max memory allocation')} bytes",
+        f"  Local Memory Size           : {d.get('Local memory size')} bytes",
+        f"  Max Constant Buffer Size    : {d.get('Max constant buffer size')} bytes",
+        f"  Max Work Group Size         : {d.get('Max work group size')}",
+        f"  Preferred WG Size Multiple  : {d.get('Preferred work group size multiple (device)')}",
+        f"  Max Work Item Sizes         : {d.get('Max work item sizes')}",
+        f"  OpenCL C Version            : {d.get('Device OpenCL C Version')}",
+        f"  IL Version                  : {d.get('IL version')}",
+    )) + "\n")
+
+def check_opencl(clinfo_proc=None):
     info("Checking OpenCL runtime …")
     if not command_exists("clinfo"):
         fail("clinfo is not installed.")
         print(f"→ {suggest('clinfo')}")
         return False, None
 
-    clinfo_out = run(["clinfo"])
-    if not clinfo_out:
+    if clinfo_proc is None:
+        clinfo_proc = run_stream(["clinfo"])
+    if clinfo_proc is None:
         fail("Failed to run clinfo.")
         return False, None
 
-    platforms, gpus = parse_opencl_devices(clinfo_out)
+    with clinfo_proc.stdout as lines:
+        platforms, gpus = parse_opencl_devices(lines)
+    if clinfo_proc.wait() != 0 and not platforms and not gpus:
+        fail("Failed to run clinfo.")
+        return False, None
     info(f"Found OpenCL platform(s): {', '.join(sorted(platforms)) or 'none'}")
 
     if gpus:
@@ -135,32 +177,38 @@ def check_opencl():
         fail("No AMD GPU found in OpenCL device list.")
     return False, None
 
-def parse_vulkan_devices(text, fallback_mem=None):
+_VK_WANTED = frozenset((
+    "deviceName", "driverVersion", "apiVersion", "deviceType",
+    "maxComputeWorkGroupInvocations", "maxComputeSharedMemorySize",
+))
+
+def parse_vulkan_devices(lines, fallback_mem=None):
     devices = []
     current_device = {}
     mem_heaps = []
     in_heap = False
 
-    for line in text.splitlines():
-        line = line.strip()
+    for line in lines:
         if "VkPhysicalDeviceProperties:" in line:
             if current_device:
                 devices.append(current_device)
                 current_device = {}
             mem_heaps = []
-        if "=" in line:
-            key, val = map(str.strip, line.split("=", 1))
-            if key in [
-                "deviceName", "driverVersion", "apiVersion", "deviceType",
-                "maxComputeWorkGroupInvocations", "maxComputeSharedMemorySize"
-            ]:
-                current_device[key] = val
-        if "heapFlags = DEVICE_LOCAL_BIT" in line:
+            continue
+        # partition on the raw line; only the key/value slices get
+        # stripped, so non-matching lines cost no copy of themselves
+        key, sep, val = line.partition("=")
+        if not sep:
+            continue
+        key, val = key.strip(), val.strip()
+        if key in _VK_WANTED:
+            current_device[key] = val
+        elif key == "heapFlags" and "DEVICE_LOCAL_BIT" in val:
             in_heap = True
-        elif in_heap and "size =" in line:
-            match = re.search(r"size = (\d+)", line)
-            if match:
-                mem_heaps.append(int(match.group(1)))
+        elif in_heap and key == "size":
+            size = val.split(None, 1)[0] if val else ""
+            if size.isdigit():
+                mem_heaps.append(int(size))
             in_heap = False
 
     if current_device:
@@ -175,27 +223,34 @@ def parse_vulkan_devices(text, fallback_mem=None):
     return [d for d in devices if "deviceName" in d and "amd" in d["deviceName"].lower()]
 
 def summarize_vulkan(d):
-    print("\n📌 Vulkan Device Summary:")
-    print(f"  Device Name                 : {d.get('deviceName')}")
-    print(f"  Driver Version              : {d.get('driverVersion')}")
-    print(f"  Device Type                 : {d.get('deviceType')}")
-    print(f"  Vulkan API Version          : {d.get('apiVersion')}")
-    print(f"  maxComputeWorkGroupInvocations : {d.get('maxComputeWorkGroupInvocations')}")
-    print(f"  maxComputeSharedMemorySize     : {d.get('maxComputeSharedMemorySize')}")
-
-def check_vulkan(fallback_mem=None):
+    sys.stdout.write("\n".join((
+        "\n📌 Vulkan Device Summary:",
+        f"  Device Name                 : {d.get('deviceName')}",
+        f"  Driver Version              : {d.get('driverVersion')}",
+        f"  Device Type                 : {d.get('deviceType')}",
+        f"  Vulkan API Version          : {d.get('apiVersion')}",
+        f"  maxComputeWorkGroupInvocations : {d.get('maxComputeWorkGroupInvocations')}",
+        f"  maxComputeSharedMemorySize     : {d.get('maxComputeSharedMemorySize')}",
+    )) + "\n")
+
+def check_vulkan(fallback_mem=None, vulkan_proc=None):
     info("Checking Vulkan stack …")
     if not command_exists("vulkaninfo"):
         fail("vulkaninfo not found.")
         print(f"→ {suggest('vulkan-tools')}")
         return False
 
-    vulkan_out = run(["vulkaninfo"])
-    if not vulkan_out:
+    if vulkan_proc is None:
+        vulkan_proc = run_stream(["vulkaninfo"])
+    if vulkan_proc is None:
         fail("vulkaninfo execution failed.")
         return False
 
-    devices = parse_vulkan_devices(vulkan_out, fallback_mem)
+    with vulkan_proc.stdout as lines:
+        devices = parse_vulkan_devices(lines, fallback_mem)
+    if vulkan_proc.wait() != 0 and not devices:
+        fail("vulkaninfo execution failed.")
+        return False
     if devices:
         ok(f"AMD GPU(s) detected via Vulkan – Count: {len(devices)}")
         summarize_vulkan(devices[0])
@@ -206,11 +261,28 @@ def check_vulkan(fallback_mem=None):
 
 def main():
     print()
-    check_amdgpu()
-    print()
-    opencl_ok, fallback_mem = check_opencl()
-    print()
-    vulkan_ok = check_vulkan(fallback_mem)
+    # cheap probe first: when no GPU runs on amdgpu, clinfo/vulkaninfo
+    # (each hundreds of ms of driver init) cannot succeed - skip them.
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        f_lspci = ex.submit(run, ["lspci", "-k"])
+        f_lsmod = ex.submit(run, ["lsmod"])
+        amd_present = check_amdgpu(f_lspci.result(), f_lsmod.result())
+    if amd_present is False:
+        # only skip when lspci worked and showed no amdgpu binding; a
+        # failed lspci is unknown and the runtime probes still get to run
+        print()
+        warn("AMDGPU not in use - skipping OpenCL/Vulkan probes.")
+        opencl_ok = vulkan_ok = False
+    else:
+        # clinfo/vulkaninfo are independent and each take real wall time;
+        # start them together, streamed straight from their pipes, and
+        # keep the report order by consuming in sequence.
+        clinfo_proc = run_stream(["clinfo"]) if command_exists("clinfo") else None
+        vulkan_proc = run_stream(["vulkaninfo"]) if command_exists("vulkaninfo") else None
+        print()
+        opencl_ok, fallback_mem = check_opencl(clinfo_proc)
+        print()
+        vulkan_ok = check_vulkan(fallback_mem, vulkan_proc)
     print()
     if opencl_ok and vulkan_ok:
         ok("All main checks passed – system ready. 🎉")
@@ -1,10 +1,19 @@
 #!/usr/bin/env python3
+import glob
 import os
 import re
 import shutil
 import subprocess
 import sys
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+try:
+    # optional: C parser, noticeably faster on multi-KB smartctl blobs
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 # Terminal colors
 RED = '\033[0;31m'
@@ -18,11 +27,58 @@ NC = '\033[0m'
 
 controller_disks = defaultdict(list)
 
-def run(cmd):
+# Compiled once at import; these run per disk and per output line
+_RE_PCI_ADDR = re.compile(r'([0-9a-f]{2}:[0-9a-f]{2}\.[0-9])')
+_CTRL_KEYWORDS = ("sata", "raid", "sas", "storage controller", "non-volatile")
+_RE_TEMP_LINE = re.compile(r"[Tt]emperature")
+# whole tokens only: '38' matches, the '20/55)' of '(Min/Max 20/55)' must not
+_RE_TEMP_NUM = re.compile(r"(?<!\S)\d+(?!\S)")
+_RE_ATA_PREFIX = re.compile(r"^ATA\s+")
+_RE_SATA_VER = re.compile(r"SATA Version is:\s*.*?,\s*([0-9.]+ Gb/s)")
+_RE_SATA_LINK = re.compile(r"current:\s*([0-9.]+ Gb/s)")
+_RE_NVME_NS = re.compile(r"nvme\d+n\d+$")
+_RE_CRIT_WARN = re.compile(r"critical_warning\s*:\s*(\d+)")
+_RE_NVME_TEMP = re.compile(r"temperature\s*:\s*(\d+)", re.IGNORECASE)
+_RE_QUOTED = re.compile(r'"([^"]*)"')
+
+# PCI address -> (device class, description), filled by one lspci run in main
+_PCI_CACHE = {}
+
+def run(argv):
+    # argv list, shell=False: exec the tool directly instead of forking /bin/sh
     try:
-        return subprocess.check_output(cmd, shell=True, text=True, stderr=subprocess.DEVNULL).strip()
-    except subprocess.CalledProcessError:
+        result = subprocess.run(argv, capture_output=True, text=True)
+    except OSError:
         return ""
+    return result.stdout.strip() if result.returncode == 0 else ""
+
+def try_smartctl_json(device):
+    # smartctl -j -a speaks JSON for both ATA and NVMe devices; a single
+    # fork covers identity, health, temperature and interface speed.
+    # json_loads takes the stdout bytes directly - no text decode pass.
+    try:
+        raw = subprocess.run(["smartctl", "-j", "-a", device], capture_output=True).stdout
+    except OSError:
+        return None
+    if not raw:
+        return None
+    try:
+        return json_loads(raw)
+    except ValueError:
+        return None
+
+def sysread(path):
+    # sysfs attributes are tiny text files; read them in-process instead of forking cat
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+@lru_cache(maxsize=None)
+def command_exists(cmd):
+    # shutil.which stats every $PATH entry; cache it, we probe the same tools repeatedly
+    return shutil.which(cmd) is not None
 
 def print_header():
     print(f"""{BOLD_GREEN}
@@ -35,11 +91,6 @@ def print_header():
 ╚═══════════════════════════════════════════════════════════════════════════════════════╝{NC}
 """)
 
-import shutil
-import subprocess
-import sys
-
-
 def install_if_missing():
     packages = ["smartctl", "nvme"]
     package_mapping = {
@@ -51,7 +102,7 @@ def install_if_missing():
 
     pkg_mgr = None
     for mgr in ["apt", "dnf", "yum", "pacman"]:
-        if shutil.which(mgr):
+        if command_exists(mgr):
             pkg_mgr = mgr
             break
 
@@ -60,7 +111,7 @@ def install_if_missing():
         return
 
     for cmd in packages:
-        if not shutil.which(cmd):
+        if not command_exists(cmd):
             pkg_name = package_mapping[pkg_mgr][cmd]
             print(f"{BLUE}🔍 {cmd} not found. Installing {pkg_name} with {pkg_mgr}...")
             try:
@@ -75,23 +126,55 @@ def install_if_missing():
 
 def check_dependencies():
     print(f"{BLUE}🔍 Checking dependencies...{NC}")
+    # one pass over $PATH instead of a full walk per tool; shutil.which
+    # is only consulted for names the scan did not find
+    present = set()
+    for entry in os.environ.get("PATH", "").split(os.pathsep):
+        try:
+            present.update(os.listdir(entry))
+        except OSError:
+            pass
     for tool in ["smartctl", "lsblk", "lspci", "nvme"]:
-        if not shutil.which(tool):
+        if tool not in present and not command_exists(tool):
             print(f"{RED}❌ Missing tool: {tool}{NC}")
             exit(1)
 
+def build_pci_cache():
+    # One lspci fork for the whole run instead of one per disk;
+    # get_storage_controller then resolves addresses in memory.
+    for line in run(["lspci", "-mm"]).splitlines():
+        addr, _, rest = line.partition(" ")
+        fields = _RE_QUOTED.findall(rest)
+        if addr and len(fields) >= 3:
+            _PCI_CACHE[addr] = (fields[0], f"{fields[1]} {fields[2]}")
+
+@lru_cache(maxsize=None)
+def _controller_for_addresses(addresses):
+    # disks behind the same HBA share one PCI path; resolve it only once
+    for addr in reversed(addresses):
+        pci_class, description = _PCI_CACHE.get(addr, ("", ""))
+        # match class and description: SAS HBAs report class "Serial
+        # Attached SCSI controller", which only hits a keyword via the
+        # device name (e.g. "SAS3008")
+        low = f"{pci_class} {description}".casefold()
+        if any(keyword in low for keyword in _CTRL_KEYWORDS):
+            return f"{addr} {description}"
+    return "Unknown Controller"
+
 def get_storage_controller(devpath):
     # devpath like : /sys/block/sda/device
+    # /sys/block/<dev> is itself a symlink into the PCI tree, so a single
+    # readlink yields the whole address chain without realpath's
+    # per-component readlink/lstat walk.
     try:
-        real_path = os.path.realpath(devpath)
-        addresses = re.findall(r'([0-9a-f]{2}:[0-9a-f]{2}\.[0-9])', real_path)
-        for addr in reversed(addresses):
-            line = run(f"lspci -s {addr}")
-            if re.search(r'sata|raid|sas|storage controller|non-volatile', line, re.IGNORECASE):
-                return f"{addr} {line.split(':', 2)[-1].strip()}"
-    except Exception:
-        pass
-    return "Unknown Controller"
+        pci_path = os.readlink(os.path.dirname(devpath))
+    except OSError:
+        try:
+            pci_path = os.path.realpath(devpath)
+        except OSError:
+            return "Unknown Controller"
+    addresses = tuple(_RE_PCI_ADDR.findall(pci_path))
+    return _controller_for_addresses(addresses)
 
 def format_smart_health(status):
     if status in ("PASSED", "OK", "0"):
@@ -101,109 +184,232 @@ def format_smart_health(status):
     else:
         return f"{RED}❤️ SMART: ⚠️ ,{NC}"
 
-def get_drive_temperature(device):
-    output = run(f"smartctl -A {device}")
+def extract_drive_temperature(output):
     for line in output.splitlines():
-        if re.search(r"[Tt]emperature", line):
-            fields = line.split()
-            for val in reversed(fields):
-                if val.isdigit() and 0 < int(val) < 150:
+        if _RE_TEMP_LINE.search(line):
+            for val in reversed(_RE_TEMP_NUM.findall(line)):
+                if 0 < int(val) < 150:
                     return f"🌡️ {val}°C,"
     return "🌡️ N/A,"
 
+_SPEED_ORDER = {"SATA?": 0, "SATA1": 1, "SATA3": 3, "SATA6": 6}
+_LINK_COLOR = {"SATA6": GREEN, "SATA3": YELLOW}
+
+def get_temperature_from_attributes(data):
+    # fallback when smartctl JSON lacks temperature.current: index the
+    # attribute table by id once and look up 194/190 directly
+    table = data.get("ata_smart_attributes", {}).get("table", [])
+    by_id = {attr.get("id"): attr for attr in table}
+    for attr_id in (194, 190):
+        attr = by_id.get(attr_id)
+        if attr:
+            value = attr.get("raw", {}).get("value")
+            if isinstance(value, int):
+                # raw values may pack min/max into the high bytes
+                temp = value & 0xFF
+                if 0 < temp < 150:
+                    return temp
+    return None
+
+@lru_cache(maxsize=32)
 def color_link_speed(link, max_iface=None):
-    speed_order = {"SATA?": 0, "SATA1": 1, "SATA3": 3, "SATA6": 6}
-    link_val = speed_order.get(link, 0)
-    max_val = speed_order.get(max_iface, 0)
+    link_val = _SPEED_ORDER.get(link, 0)
+    max_val = _SPEED_ORDER.get(max_iface, 0)
 
     if max_val and link_val < max_val:
         return f"{BOLD_RED}🧩 link={link}{NC}"
-    elif "SATA6" in link:
-        return f"{GREEN}🧩 link={link}{NC}"
-    elif "SATA3" in link:
-        return f"{YELLOW}🧩 link={link}{NC}"
+    for label, color in _LINK_COLOR.items():
+        if label in link:
+            return f"{color}🧩 link={link}{NC}"
     return f"🧩 link={link}"
 
+def format_bytes(size):
+    # human-readable form like lsblk prints: one decimal, binary units;
+    # the bit length picks the unit directly instead of dividing in a loop
+    size = int(size)
+    shift = min((size.bit_length() - 1) // 10, 6) if size > 0 else 0
+    if shift == 0:
+        return f"{size}B"
+    return f"{size / (1 << (shift * 10)):.1f}{'BKMGTPE'[shift]}"
+
+def get_disk_size(disk):
+    # /sys/block/<dev>/size counts 512-byte sectors; no lsblk fork needed
+    sectors = sysread(f"/sys/block/{disk}/size")
+    return format_bytes(int(sectors) * 512) if sectors.isdigit() else "unknown"
+
 def clean_model_name(model):
-    return re.sub(r"^ATA\s+", "", model).strip()
+    return _RE_ATA_PREFIX.sub("", model).strip()
 
-def get_smart_field(device, label):
-    output = run(f"smartctl -i {device}")
-    match = re.search(rf"{label}:\s*(.+)", output, re.IGNORECASE)
-    return match.group(1).strip() if match else "unknown"
+def smart_kv(output):
+    # one pass over the "Label: value" lines of smartctl/nvme output;
+    # every field lookup afterwards is a dict access
+    kv = {}
+    for line in output.splitlines():
+        key, sep, val = line.partition(":")
+        if sep and val.strip():
+            kv.setdefault(key.strip().lower(), val.strip())
+    return kv
 
-def get_sata_version_and_link(info_output):
-    sata_cap = re.search(r"SATA Version is:\s*.*?,\s*([0-9.]+ Gb/s)", info_output)
-    current_link = re.search(r"current:\s*([0-9.]+ Gb/s)", info_output)
-    max_speed = sata_cap.group(1) if sata_cap else "unknown"
-    link_speed = current_link.group(1) if current_link else max_speed
+def classify_sata(max_speed, link_speed):
     iface = "SATA6" if "6.0" in max_speed else "SATA3" if "3.0" in max_speed else "SATA?"
     link = "SATA6" if "6.0" in link_speed else "SATA3" if "3.0" in link_speed else "SATA?"
     return iface, link
 
-def process_sata_disks():
-    print(f"{BLUE}🧮 Scanning SATA disks...{NC}")
-    for disk in sorted(os.listdir("/sys/block")):
-        if not disk.startswith("sd"):
-            continue
-        device = f"/dev/{disk}"
-        devpath = f"/sys/block/{disk}/device"
-        controller = get_storage_controller(devpath)
-        model = clean_model_name(run(f"cat /sys/block/{disk}/device/model"))
-        size = run(f"lsblk -dn -o SIZE {device}")
-        serial = get_smart_field(device, "Serial Number")
-        firmware = get_smart_field(device, "Firmware Version")
-        smart_status_line = run(f"smartctl -H {device}")
-        health_match = re.search(r"(PASSED|OK|FAILED)", smart_status_line, re.IGNORECASE)
-        smart_health = format_smart_health(health_match.group(1).upper() if health_match else "")
-        temperature = get_drive_temperature(device)
-        info = run(f"smartctl -i {device}")
+def get_sata_version_and_link(info_output):
+    sata_cap = _RE_SATA_VER.search(info_output)
+    current_link = _RE_SATA_LINK.search(info_output)
+    max_speed = sata_cap.group(1) if sata_cap else "unknown"
+    link_speed = current_link.group(1) if current_link else max_speed
+    return classify_sata(max_speed, link_speed)
+
+def scan_sata(disk):
+    device = f"/dev/{disk}"
+    devpath = f"/sys/block/{disk}/device"
+    controller = get_storage_controller(devpath)
+    model = clean_model_name(sysread(f"/sys/block/{disk}/device/model"))
+    size = get_disk_size(disk)
+    data = try_smartctl_json(device)
+    if data is not None:
+        serial = data.get("serial_number") or "unknown"
+        firmware = data.get("firmware_version") or "unknown"
+        passed = data.get("smart_status", {}).get("passed")
+        smart_health = format_smart_health("" if passed is None else "PASSED" if passed else "FAILED")
+        temp = data.get("temperature", {}).get("current")
+        if temp is None:
+            temp = get_temperature_from_attributes(data)
+        temperature = f"🌡️ {temp}°C," if temp is not None else "🌡️ N/A,"
+        speed = data.get("interface_speed", {})
+        max_speed = speed.get("max", {}).get("string", "unknown")
+        link_speed = speed.get("current", {}).get("string") or max_speed
+        iface, link = classify_sata(max_speed, link_speed)
+    else:
+        # old smartctl without JSON: -x still returns info + health +
+        # attributes in one pass
+        info = run(["smartctl", "-x", device])
+        kv = smart_kv(info)
+        serial = kv.get("serial number", "unknown")
+        firmware = kv.get("firmware version", "unknown")
+        # the verdict sits on its own labelled line which smart_kv already
+        # indexed; scanning the whole dump for PASSED/FAILED would also
+        # trip over the WHEN_FAILED attribute-table header
+        health = (kv.get("smart overall-health self-assessment test result")
+                  or kv.get("smart health status") or "")
+        smart_health = format_smart_health(health.upper())
+        temperature = extract_drive_temperature(info)
         iface, link = get_sata_version_and_link(info)
-        link_display = color_link_speed(link, iface)
+    link_display = color_link_speed(link, iface)
+
+    return controller, (
+        f"{GREEN}💾 {device}{NC}  ({model}, {size}, {iface}, {link_display}, "
+        f"{smart_health} {temperature} 🔢 SN: {serial}, 🔧 FW: {firmware})"
+    )
+
+def nvme_hwmon_temp(base):
+    # the kernel exports the composite temperature through hwmon in
+    # millidegrees C; one file read, no admin command
+    for path in glob.glob(f"/sys/class/nvme/{base}/hwmon*/temp1_input"):
+        val = sysread(path)
+        if val.lstrip("-").isdigit():
+            return int(val) // 1000
+    return None
+
+@lru_cache(maxsize=None)
+def nvme_controller_health(base):
+    # SMART health and temperature live on the controller, not the
+    # namespace; fetch them once per controller and let all of its
+    # namespaces share the result
+    temp = nvme_hwmon_temp(base)
+    data = try_smartctl_json(f"/dev/{base}")
+    if data is not None:
+        log = data.get("nvme_smart_health_information_log", {})
+        crit = log.get("critical_warning")
+        health = format_smart_health("" if crit is None else "OK" if crit == 0 else "FAILED")
+        if temp is None:
+            temp = data.get("temperature", {}).get("current")
+    else:
+        smart_log = run(["nvme", "smart-log", f"/dev/{base}"])
+        crit_warn = _RE_CRIT_WARN.search(smart_log)
+        health = format_smart_health("OK" if crit_warn and crit_warn.group(1) == "0" else "FAILED")
+        if temp is None:
+            temp_match = _RE_NVME_TEMP.search(smart_log)
+            temp = int(temp_match.group(1)) if temp_match else None
+    temperature = f"🌡️ {temp}°C," if temp is not None else "🌡️ N/A,"
+    return health, temperature
+
+def scan_nvme(entry):
+    nvdev = f"/dev/{entry}"
+    sysdev = f"/sys/block/{entry}/device"
+    base = entry[:entry.rindex("n")]  # nvme3n2 -> controller nvme3
+    controller = get_storage_controller(sysdev)
+    # the controller exports its identity in sysfs; nvme id-ctrl is only
+    # needed as a fallback on kernels that don't provide these attributes
+    model = clean_model_name(sysread(f"/sys/class/nvme/{base}/model"))
+    serial = sysread(f"/sys/class/nvme/{base}/serial")
+    firmware = sysread(f"/sys/class/nvme/{base}/firmware_rev")
+    if not (model and serial and firmware):
+        kv = smart_kv(run(["nvme", "id-ctrl", "-H", nvdev]))
+        model = model or clean_model_name(kv.get("mn", "")) or "unknown"
+        serial = serial or kv.get("sn", "") or "unknown"
+        firmware = firmware or kv.get("fr", "") or "unknown"
+    size = get_disk_size(entry)
+    health, temperature = nvme_controller_health(base)
+    # no current_link_width means no PCIe link info at all (VM/fabrics),
+    # so don't bother reading the sibling attribute
+    width = sysread(f"/sys/class/nvme/{base}/device/current_link_width")
+    speed = sysread(f"/sys/class/nvme/{base}/device/current_link_speed") if width else ""
+    link = f"PCIe {speed} x{width}".strip()
+    link_display = color_link_speed(link)
 
-        controller_disks[controller].append(
-            f"{GREEN}💾 {device}{NC}  ({model}, {size}, {iface}, {link_display}, "
-            f"{smart_health} {temperature} 🔢 SN: {serial}, 🔧 FW: {firmware})"
-        )
+    return controller, (
+        f"{GREEN}💾 {nvdev}{NC}  {model}, {size}, NVMe, {link_display}, "
+        f"{health} {temperature} 🔢 SN: {serial}, 🔧 FW: {firmware}"
+    )
 
-def process_nvme_disks():
+def process_disks():
+    print(f"{BLUE}🧮 Scanning SATA disks...{NC}")
     print(f"{BLUE}⚡ Scanning NVMe disks...{NC}")
-    for entry in os.listdir("/dev"):
-        if re.match(r"nvme\d+n1$", entry):
-            nvdev = f"/dev/{entry}"
-            sysdev = f"/sys/block/{entry}/device"
-            controller = get_storage_controller(sysdev)
-            idctrl = run(f"nvme id-ctrl -H {nvdev}")
-            if not idctrl:
-                continue
-            model = re.search(r"mn\s*:\s*(.+)", idctrl, re.IGNORECASE)
-            serial = re.search(r"sn\s*:\s*(.+)", idctrl, re.IGNORECASE)
-            firmware = re.search(r"fr\s*:\s*(.+)", idctrl, re.IGNORECASE)
-            model = clean_model_name(model.group(1).strip()) if model else "unknown"
-            serial = serial.group(1).strip() if serial else "unknown"
-            firmware = firmware.group(1).strip() if firmware else "unknown"
-            size = run(f"lsblk -dn -o SIZE {nvdev}")
-            smart_log = run(f"nvme smart-log {nvdev}")
-            crit_warn = re.search(r"critical_warning\s*:\s*(\d+)", smart_log)
-            health = format_smart_health("OK" if crit_warn and crit_warn.group(1) == "0" else "FAILED")
-            temperature = get_drive_temperature(nvdev)
-            width = run(f"cat /sys/class/nvme/{entry[:-2]}/device/current_link_width")
-            speed = run(f"cat /sys/class/nvme/{entry[:-2]}/device/current_link_speed")
-            link = f"PCIe {speed} x{width}".strip()
-            link_display = color_link_speed(link)
-
-            controller_disks[controller].append(
-                f"{GREEN}💾 {nvdev}{NC}  {model}, {size}, NVMe, {link_display}, "
-                f"{health} {temperature} 🔢 SN: {serial}, 🔧 FW: {firmware}"
-            )
+    # /sys/block lists whole disks only, so one small scan covers both
+    # families; /dev holds thousands of unrelated nodes
+    disks, entries = [], []
+    with os.scandir("/sys/block") as it:
+        for e in it:
+            # two 1-byte sysfs reads up front: phantom devices (size 0)
+            # and removable media would otherwise cost a full smartctl
+            # fan-out, often hanging seconds in SCSI timeouts
+            if e.name.startswith("sd"):
+                if sysread(f"/sys/block/{e.name}/size") in ("", "0"):
+                    continue
+                if sysread(f"/sys/block/{e.name}/removable") == "1":
+                    continue
+                disks.append(e.name)
+            elif e.name.startswith("nvme") and _RE_NVME_NS.match(e.name):
+                if sysread(f"/sys/block/{e.name}/size") in ("", "0"):
+                    continue
+                entries.append(e.name)
+    disks.sort()
+    entries.sort()
+
+    tasks = [(scan_sata, disk) for disk in disks] + [(scan_nvme, entry) for entry in entries]
+    if not tasks:
+        return
+    # one pool for both families: subprocess calls release the GIL, so
+    # threads give near-linear speedup and NVMe never waits on SATA
+    with ThreadPoolExecutor(max_workers=min(32, len(tasks) * 2)) as ex:
+        futures = [ex.submit(fn, arg) for fn, arg in tasks]
+        for future in futures:
+            result = future.result()
+            if result:
+                controller, line = result
+                controller_disks[controller].append(line)
 
 def print_output():
     print(f"{BLUE}📤 Preparing output...{NC}")
+    out = []
     for ctrl in sorted(controller_disks.keys()):
-        print(f"{CYAN}🎯 {ctrl}{NC}")
-        for line in controller_disks[ctrl]:
-            print(f"  └── {line}")
-        print()
+        out.append(f"{CYAN}🎯 {ctrl}{NC}")
+        out.extend(f"  └── {line}" for line in controller_disks[ctrl])
+        out.append("")
+    sys.stdout.write("\n".join(out) + "\n")
 
 def main():
     if os.geteuid() != 0:
@@ -212,8 +418,8 @@ def main():
     print_header()
     install_if_missing()
     check_dependencies()
-    process_sata_disks()
-    process_nvme_disks()
+    build_pci_cache()
+    process_disks()
     print_output()
 
 if __name__ == "__main__":